@@ -7,6 +7,7 @@ import os
 from pathlib import Path
 from typing import Any, AsyncGenerator, Dict, Union, cast
 
+import httpx
 from azure.core.credentials import AzureKeyCredential
 from azure.core.credentials_async import AsyncTokenCredential
 from azure.core.exceptions import ResourceNotFoundError
@@ -55,6 +56,7 @@ from config import (
     CONFIG_VECTOR_SEARCH_ENABLED,
 )
 from core.authentication import AuthenticationHelper
+from core.semanticcache import SemanticCache
 from decorators import authenticated, authenticated_path
 from error import error_dict, error_response
 
@@ -145,7 +147,8 @@ async def ask(auth_claims: Dict[str, Any]):
 class JSONEncoder(json.JSONEncoder):
     def default(self, o):
         if dataclasses.is_dataclass(o):
-            return dataclasses.asdict(o)
+            # Only convert the top level, the encoder serializes the nested values without copying them like asdict
+            return {field.name: getattr(o, field.name) for field in dataclasses.fields(o)}
         return super().default(o)
 
 
@@ -252,6 +255,9 @@ async def setup_clients():
     AZURE_SEARCH_SEMANTIC_RANKER = os.getenv("AZURE_SEARCH_SEMANTIC_RANKER", "free").lower()
 
     USE_GPT4V = os.getenv("USE_GPT4V", "").lower() == "true"
+    USE_SEMANTIC_CACHE = os.getenv("USE_SEMANTIC_CACHE", "").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.97))
+    SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", 3600))
 
     # Use the current user identity to authenticate with Azure OpenAI, AI Search and Blob Storage (no secrets needed,
     # just use 'az login' locally, and managed identity when deployed on Azure). If you need to use keys, use separate AzureKeyCredential instances with the
@@ -301,6 +307,14 @@ async def setup_clients():
     # Used by the OpenAI SDK
     openai_client: AsyncOpenAI
 
+    # Share a single pool of keep-alive connections between all requests to the OpenAI endpoint
+    openai_http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=64, max_connections=128, keepalive_expiry=120),
+        http2=True,
+        # Keep the SDK's default read timeout, so long answers aren't cut off and retried, but fail fast on connect
+        timeout=httpx.Timeout(600.0, connect=5.0),
+    )
+
     if OPENAI_HOST.startswith("azure"):
         token_provider = get_bearer_token_provider(azure_credential, "https://cognitiveservices.azure.com/.default")
 
@@ -315,16 +329,19 @@ async def setup_clients():
             api_version=api_version,
             azure_endpoint=endpoint,
             azure_ad_token_provider=token_provider,
+            http_client=openai_http_client,
         )
     elif OPENAI_HOST == "local":
         openai_client = AsyncOpenAI(
             base_url=os.environ["OPENAI_BASE_URL"],
             api_key="no-key-required",
+            http_client=openai_http_client,
         )
     else:
         openai_client = AsyncOpenAI(
             api_key=OPENAI_API_KEY,
             organization=OPENAI_ORGANIZATION,
+            http_client=openai_http_client,
         )
 
     current_app.config[CONFIG_OPENAI_CLIENT] = openai_client
@@ -405,13 +422,20 @@ async def setup_clients():
         content_field=KB_FIELDS_CONTENT,
         query_language=AZURE_SEARCH_QUERY_LANGUAGE,
         query_speller=AZURE_SEARCH_QUERY_SPELLER,
+        semantic_cache=(
+            SemanticCache(threshold=SEMANTIC_CACHE_THRESHOLD, ttl=SEMANTIC_CACHE_TTL) if USE_SEMANTIC_CACHE else None
+        ),
     )
 
+    # Open the connection to the OpenAI endpoint before the first user request comes in
+    await current_app.config[CONFIG_CHAT_APPROACH].warmup()
+
 
 @bp.after_app_serving
 async def close_clients():
     await current_app.config[CONFIG_SEARCH_CLIENT].close()
     await current_app.config[CONFIG_BLOB_CONTAINER_CLIENT].close()
+    await current_app.config[CONFIG_OPENAI_CLIENT].close()
 
 
 def create_app():
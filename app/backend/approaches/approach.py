@@ -1,3 +1,4 @@
+import logging
 import os
 from abc import ABC
 from dataclasses import dataclass
@@ -253,6 +254,14 @@ class Approach(ABC):
                 image_query_vector = json["vector"]
         return VectorizedQuery(vector=image_query_vector, k_nearest_neighbors=50, fields="imageEmbedding")
 
+    async def warmup(self):
+        """Makes a cheap request to the OpenAI endpoint, so that the TLS connection and any credentials are ready."""
+        try:
+            # Bound the request, the shared client's read timeout and retries are sized for long answers
+            await self.openai_client.with_options(timeout=10.0, max_retries=0).models.list()
+        except Exception as error:
+            logging.warning("Unable to warm up the OpenAI connection: %s", error)
+
     async def run(
         self, messages: list[dict], stream: bool = False, session_state: Any = None, context: dict[str, Any] = {}
     ) -> Union[dict[str, Any], AsyncGenerator[dict[str, Any], None]]:
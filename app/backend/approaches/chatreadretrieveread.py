@@ -1,18 +1,36 @@
-from typing import Any, Coroutine, List, Literal, Optional, Union, overload
+import json
+import logging
+import time
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterable,
+    Coroutine,
+    List,
+    Literal,
+    Optional,
+    Union,
+    overload,
+)
 
 from azure.search.documents.aio import SearchClient
-from azure.search.documents.models import VectorQuery
-from openai import AsyncOpenAI, AsyncStream
+from azure.search.documents.models import VectorizedQuery, VectorQuery
+from openai import AsyncOpenAI
 from openai.types.chat import (
     ChatCompletion,
     ChatCompletionChunk,
+    ChatCompletionMessage,
     ChatCompletionToolParam,
 )
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice
+from openai.types.chat.chat_completion_chunk import ChoiceDelta
 
 from approaches.approach import ThoughtStep
 from approaches.chatapproach import ChatApproach
 from core.authentication import AuthenticationHelper
 from core.modelhelper import get_token_limit
+from core.semanticcache import SemanticCache
 
 
 class ChatReadRetrieveReadApproach(ChatApproach):
@@ -22,6 +40,26 @@ class ChatReadRetrieveReadApproach(ChatApproach):
     original user question, and search results to OpenAI to generate a response.
     """
 
+    search_tools: List[ChatCompletionToolParam] = [
+        {
+            "type": "function",
+            "function": {
+                "name": "search_sources",
+                "description": "Retrieve sources from the Azure AI Search index",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "search_query": {
+                            "type": "string",
+                            "description": "Query string to retrieve documents from azure search eg: 'Health care plan'",
+                        }
+                    },
+                    "required": ["search_query"],
+                },
+            },
+        }
+    ]
+
     def __init__(
         self,
         *,
@@ -37,6 +75,7 @@ class ChatReadRetrieveReadApproach(ChatApproach):
         content_field: str,
         query_language: str,
         query_speller: str,
+        semantic_cache: Optional[SemanticCache] = None,
     ):
         self.search_client = search_client
         self.openai_client = openai_client
@@ -51,10 +90,9 @@ class ChatReadRetrieveReadApproach(ChatApproach):
         self.query_language = query_language
         self.query_speller = query_speller
         self.chatgpt_token_limit = get_token_limit(chatgpt_model)
+        self.semantic_cache = semantic_cache
 
-    @property
-    def system_message_chat_conversation(self):
-        return """Assistant helps the company employees with their healthcare plan questions, and questions about the employee handbook. Be brief in your answers.
+    system_message_chat_conversation = """Assistant helps the company employees with their healthcare plan questions, and questions about the employee handbook. Be brief in your answers.
         Answer ONLY with the facts listed in the list of sources below. If there isn't enough information below, say you don't know. Do not generate answers that don't use the sources below. If asking a clarifying question to the user would help, ask the question.
         For tabular information return it as an html table. Do not return markdown format. If the question is not in English, answer in the language used in the question.
         Each source has a name followed by colon and the actual information, always include the source name for each fact you use in the response. Use square brackets to reference the source, for example [info1.txt]. Don't combine sources, list each source separately, for example [info1.txt][info2.pdf].
@@ -78,7 +116,7 @@ class ChatReadRetrieveReadApproach(ChatApproach):
         overrides: dict[str, Any],
         auth_claims: dict[str, Any],
         should_stream: Literal[True],
-    ) -> tuple[dict[str, Any], Coroutine[Any, Any, AsyncStream[ChatCompletionChunk]]]: ...
+    ) -> tuple[dict[str, Any], Coroutine[Any, Any, AsyncIterable[ChatCompletionChunk]]]: ...
 
     async def run_until_final_call(
         self,
@@ -86,7 +124,7 @@ class ChatReadRetrieveReadApproach(ChatApproach):
         overrides: dict[str, Any],
         auth_claims: dict[str, Any],
         should_stream: bool = False,
-    ) -> tuple[dict[str, Any], Coroutine[Any, Any, Union[ChatCompletion, AsyncStream[ChatCompletionChunk]]]]:
+    ) -> tuple[dict[str, Any], Coroutine[Any, Any, Union[ChatCompletion, AsyncIterable[ChatCompletionChunk]]]]:
         has_text = overrides.get("retrieval_mode") in ["text", "hybrid", None]
         has_vector = overrides.get("retrieval_mode") in ["vectors", "hybrid", None]
         use_semantic_captions = True if overrides.get("semantic_captions") and has_text else False
@@ -98,27 +136,32 @@ class ChatReadRetrieveReadApproach(ChatApproach):
         use_semantic_ranker = True if overrides.get("semantic_ranker") and has_text else False
 
         original_user_query = history[-1]["content"]
-        user_query_request = "Generate search query for: " + original_user_query
 
-        tools: List[ChatCompletionToolParam] = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_sources",
-                    "description": "Retrieve sources from the Azure AI Search index",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "search_query": {
-                                "type": "string",
-                                "description": "Query string to retrieve documents from azure search eg: 'Health care plan'",
-                            }
-                        },
-                        "required": ["search_query"],
-                    },
-                },
-            }
-        ]
+        # Only the first turn of a conversation is cached, follow-up questions depend on the rest of the history
+        cache_vector: Optional[VectorizedQuery] = None
+        cache_scope = ""
+        if self.semantic_cache is not None and len(history) == 1:
+            cache_scope = json.dumps({"overrides": overrides, "filter": filter}, sort_keys=True, default=str)
+            # Exact repeats of a question don't need an embedding to be found
+            cached = self.semantic_cache.lookup_exact(original_user_query, cache_scope)
+            if cached is None:
+                try:
+                    cache_vector = await self.compute_text_embedding(original_user_query)
+                except Exception as error:
+                    # The cache is an optimization, answer without it when no embedding can be computed
+                    logging.warning("Unable to compute an embedding for the semantic cache: %s", error)
+                else:
+                    cached = self.semantic_cache.lookup(cache_vector.vector, cache_scope)
+            if cached:
+                # The cached thoughts would show the prompts built from another user's question, so only the
+                # sources are reused
+                extra_info = {
+                    "data_points": cached.data_points,
+                    "thoughts": [ThoughtStep("Served from semantic cache", original_user_query)],
+                }
+                return (extra_info, self.cached_chat_completion(cached.completion_text, should_stream))
+
+        user_query_request = "Generate search query for: " + original_user_query
 
         # STEP 1: Generate an optimized keyword search query based on the chat history and the last question
         query_messages = self.get_messages_from_history(
@@ -137,7 +180,7 @@ class ChatReadRetrieveReadApproach(ChatApproach):
             temperature=0.0,  # Minimize creativity for search query generation
             max_tokens=100,  # Setting too low risks malformed JSON, setting too high may affect performance
             n=1,
-            tools=tools,
+            tools=self.search_tools,
             tool_choice="auto",
         )
 
@@ -148,7 +191,11 @@ class ChatReadRetrieveReadApproach(ChatApproach):
         # If retrieval mode includes vectors, compute an embedding for the query
         vectors: list[VectorQuery] = []
         if has_vector:
-            vectors.append(await self.compute_text_embedding(query_text))
+            if cache_vector is not None and query_text == original_user_query:
+                # Reuse the embedding computed for the semantic cache lookup
+                vectors.append(cache_vector)
+            else:
+                vectors.append(await self.compute_text_embedding(query_text))
 
         # Only keep the text query if the retrieval mode uses text, otherwise drop it
         if not has_text:
@@ -194,7 +241,7 @@ class ChatReadRetrieveReadApproach(ChatApproach):
             "thoughts": [
                 ThoughtStep(
                     "Prompt to generate search query",
-                    [str(message) for message in query_messages],
+                    query_messages,
                     (
                         {"model": self.chatgpt_model, "deployment": self.chatgpt_deployment}
                         if self.chatgpt_deployment
@@ -218,7 +265,7 @@ class ChatReadRetrieveReadApproach(ChatApproach):
                 ),
                 ThoughtStep(
                     "Prompt to generate answer",
-                    [str(message) for message in messages],
+                    messages,
                     (
                         {"model": self.chatgpt_model, "deployment": self.chatgpt_deployment}
                         if self.chatgpt_deployment
@@ -228,6 +275,7 @@ class ChatReadRetrieveReadApproach(ChatApproach):
             ],
         }
 
+        chat_coroutine: Coroutine[Any, Any, Union[ChatCompletion, AsyncIterable[ChatCompletionChunk]]]
         chat_coroutine = self.openai_client.chat.completions.create(
             # Azure OpenAI takes the deployment name as the model name
             model=self.chatgpt_deployment if self.chatgpt_deployment else self.chatgpt_model,
@@ -237,4 +285,83 @@ class ChatReadRetrieveReadApproach(ChatApproach):
             n=1,
             stream=should_stream,
         )
+        if cache_vector is not None:
+            chat_coroutine = self.cache_chat_completion(
+                chat_coroutine, should_stream, original_user_query, cache_vector.vector, cache_scope, data_points
+            )
         return (extra_info, chat_coroutine)
+
+    async def cached_chat_completion(
+        self, completion_text: str, should_stream: bool
+    ) -> Union[ChatCompletion, AsyncIterable[ChatCompletionChunk]]:
+        if should_stream:
+            return self.stream_cached_chat_completion(completion_text)
+        return ChatCompletion(
+            id="cached",
+            object="chat.completion",
+            created=int(time.time()),
+            model=self.chatgpt_model,
+            choices=[
+                Choice(
+                    index=0,
+                    finish_reason="stop",
+                    message=ChatCompletionMessage(role="assistant", content=completion_text),
+                )
+            ],
+        )
+
+    async def stream_cached_chat_completion(self, completion_text: str) -> AsyncGenerator[ChatCompletionChunk, None]:
+        yield ChatCompletionChunk(
+            id="cached",
+            object="chat.completion.chunk",
+            created=int(time.time()),
+            model=self.chatgpt_model,
+            choices=[
+                ChunkChoice(
+                    index=0,
+                    finish_reason="stop",
+                    delta=ChoiceDelta(role="assistant", content=completion_text),
+                )
+            ],
+        )
+
+    async def cache_chat_completion(
+        self,
+        chat_coroutine: Coroutine[Any, Any, Union[ChatCompletion, AsyncIterable[ChatCompletionChunk]]],
+        should_stream: bool,
+        query: str,
+        embedding: List[float],
+        scope: str,
+        data_points: dict[str, Any],
+    ) -> Union[ChatCompletion, AsyncIterable[ChatCompletionChunk]]:
+        if should_stream:
+            return self.cache_chat_completion_stream(
+                await chat_coroutine, query, embedding, scope, data_points  # type: ignore
+            )
+        chat_completion: ChatCompletion = await chat_coroutine  # type: ignore
+        choice = chat_completion.choices[0]
+        if semantic_cache := self.semantic_cache:
+            # Don't cache truncated or filtered answers
+            if choice.finish_reason == "stop" and choice.message.content:
+                semantic_cache.add(query, embedding, scope, data_points, choice.message.content)
+        return chat_completion
+
+    async def cache_chat_completion_stream(
+        self,
+        chat_stream: AsyncIterable[ChatCompletionChunk],
+        query: str,
+        embedding: List[float],
+        scope: str,
+        data_points: dict[str, Any],
+    ) -> AsyncGenerator[ChatCompletionChunk, None]:
+        completion_text = ""
+        finish_reason = None
+        async for chunk in chat_stream:
+            if chunk.choices:
+                completion_text += chunk.choices[0].delta.content or ""
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+            yield chunk
+        if semantic_cache := self.semantic_cache:
+            # Don't cache truncated or filtered answers
+            if finish_reason == "stop" and completion_text:
+                semantic_cache.add(query, embedding, scope, data_points, completion_text)
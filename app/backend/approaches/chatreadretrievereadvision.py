@@ -1,3 +1,4 @@
+import asyncio
 from typing import Any, Awaitable, Callable, Coroutine, Optional, Union
 
 from azure.search.documents.aio import SearchClient
@@ -60,9 +61,7 @@ class ChatReadRetrieveReadVisionApproach(ChatApproach):
         self.vision_token_provider = vision_token_provider
         self.chatgpt_token_limit = get_token_limit(gpt4v_model)
 
-    @property
-    def system_message_chat_conversation(self):
-        return """
+    system_message_chat_conversation = """
         You are an intelligent assistant helping analyze the Annual Financial Report of Contoso Ltd., The documents contain text, graphs, tables and images.
         Each image source has the file name in the top left corner of the image with coordinates (10,10) pixels and is in the format SourceFileName:<file_name>
         Each text source starts in a new line and has the file name followed by colon and the actual information
@@ -126,13 +125,16 @@ class ChatReadRetrieveReadVisionApproach(ChatApproach):
         # If retrieval mode includes vectors, compute an embedding for the query
         vectors = []
         if has_vector:
-            for field in vector_fields:
-                vector = (
-                    await self.compute_text_embedding(query_text)
+            # Text and image embeddings don't depend on each other, so request them concurrently
+            embedding_coroutines = [
+                (
+                    self.compute_text_embedding(query_text)
                     if field == "embedding"
-                    else await self.compute_image_embedding(query_text)
+                    else self.compute_image_embedding(query_text)
                 )
-                vectors.append(vector)
+                for field in vector_fields
+            ]
+            vectors = list(await asyncio.gather(*embedding_coroutines))
 
         # Only keep the text query if the retrieval mode uses text, otherwise drop it
         if not has_text:
@@ -168,8 +170,8 @@ class ChatReadRetrieveReadVisionApproach(ChatApproach):
         if include_gtpV_text:
             user_content.append({"text": "\n\nSources:\n" + content, "type": "text"})
         if include_gtpV_images:
-            for result in results:
-                url = await fetch_image(self.blob_container_client, result)
+            urls = await asyncio.gather(*(fetch_image(self.blob_container_client, result) for result in results))
+            for url in urls:
                 if url:
                     image_list.append({"image_url": url, "type": "image_url"})
             user_content.extend(image_list)
@@ -192,7 +194,7 @@ class ChatReadRetrieveReadVisionApproach(ChatApproach):
             "thoughts": [
                 ThoughtStep(
                     "Prompt to generate search query",
-                    [str(message) for message in query_messages],
+                    query_messages,
                     (
                         {"model": self.gpt4v_model, "deployment": self.gpt4v_deployment}
                         if self.gpt4v_deployment
@@ -216,7 +218,7 @@ class ChatReadRetrieveReadVisionApproach(ChatApproach):
                 ),
                 ThoughtStep(
                     "Prompt to generate answer",
-                    [str(message) for message in messages],
+                    messages,
                     (
                         {"model": self.gpt4v_model, "deployment": self.gpt4v_deployment}
                         if self.gpt4v_deployment
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from typing import Any, AsyncGenerator, Awaitable, Callable, Optional, Union
 
@@ -100,13 +101,12 @@ class RetrieveThenReadVisionApproach(Approach):
 
         vectors = []
         if has_vector:
-            for field in vector_fields:
-                vector = (
-                    await self.compute_text_embedding(q)
-                    if field == "embedding"
-                    else await self.compute_image_embedding(q)
-                )
-                vectors.append(vector)
+            # Text and image embeddings don't depend on each other, so request them concurrently
+            embedding_coroutines = [
+                self.compute_text_embedding(q) if field == "embedding" else self.compute_image_embedding(q)
+                for field in vector_fields
+            ]
+            vectors = list(await asyncio.gather(*embedding_coroutines))
 
         # Only keep the text query if the retrieval mode uses text, otherwise drop it
         query_text = q if has_text else None
@@ -137,8 +137,8 @@ class RetrieveThenReadVisionApproach(Approach):
             content = "\n".join(sources_content)
             user_content.append({"text": content, "type": "text"})
         if include_gtpV_images:
-            for result in results:
-                url = await fetch_image(self.blob_container_client, result)
+            urls = await asyncio.gather(*(fetch_image(self.blob_container_client, result) for result in results))
+            for url in urls:
                 if url:
                     image_list.append({"image_url": url, "type": "image_url"})
             user_content.extend(image_list)
@@ -181,7 +181,7 @@ class RetrieveThenReadVisionApproach(Approach):
                 ),
                 ThoughtStep(
                     "Prompt to generate answer",
-                    [str(message) for message in updated_messages],
+                    updated_messages,
                     (
                         {"model": self.gpt4v_model, "deployment": self.gpt4v_deployment}
                         if self.gpt4v_deployment
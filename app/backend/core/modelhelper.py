@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from collections.abc import Mapping
+from functools import lru_cache
 
 import tiktoken
 
@@ -41,7 +42,7 @@ def num_tokens_from_messages(message: Mapping[str, object], model: str) -> int:
         output: 11
     """
 
-    encoding = tiktoken.encoding_for_model(get_oai_chatmodel_tiktok(model))
+    encoding = get_encoding_for_model(model)
     num_tokens = 2  # For "role" and "content" keys
     for value in message.values():
         if isinstance(value, list):
@@ -59,6 +60,12 @@ def num_tokens_from_messages(message: Mapping[str, object], model: str) -> int:
     return num_tokens
 
 
+@lru_cache(maxsize=8)
+def get_encoding_for_model(model: str) -> tiktoken.Encoding:
+    # Token counting runs for every message in the history, so only resolve the encoding once per model
+    return tiktoken.encoding_for_model(get_oai_chatmodel_tiktok(model))
+
+
 def get_oai_chatmodel_tiktok(aoaimodel: str) -> str:
     message = "Expected Azure OpenAI ChatGPT model name"
     if aoaimodel == "" or aoaimodel is None:
@@ -0,0 +1,108 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass
+class CacheEntry:
+    query: str
+    scope: str
+    data_points: dict[str, Any]
+    completion_text: str
+    last_access: float
+    row: int
+    created: float = field(default_factory=time.monotonic)
+
+
+class SemanticCache:
+    """
+    In-process cache of chat answers keyed by the user question.
+    Exact repeats of a question are found with a dictionary lookup. Otherwise, a lookup hits when a previously
+    answered question in the same scope has an embedding with a cosine similarity above the threshold,
+    so paraphrases of an earlier question can be answered without another round trip to the chat model.
+    The scope should capture everything besides the question that affects the answer (overrides, security filter),
+    so that answers are never shared across users that are allowed to see different documents.
+    Entries expire after ttl seconds, so that answers pick up changes to the indexed documents.
+    The default threshold suits OpenAI embedding models, whose similarities sit in a narrow, high band:
+    distinct questions on the same topic commonly score above 0.9.
+    """
+
+    def __init__(self, threshold: float = 0.97, max_size: int = 1024, ttl: float = 3600):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        # One row per entry, allocated on the first add once the embedding dimensions are known
+        self.embeddings: Optional[np.ndarray] = None
+        # Number of rows that have been used, only these are scored
+        self.size = 0
+        self.free_rows: List[int] = []
+        self.entries: Dict[int, CacheEntry] = {}
+        self.exact_entries: Dict[Tuple[str, str], CacheEntry] = {}
+
+    @staticmethod
+    def normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def is_expired(self, entry: CacheEntry) -> bool:
+        return time.monotonic() - entry.created > self.ttl
+
+    def remove(self, entry: CacheEntry):
+        del self.entries[entry.row]
+        if self.exact_entries.get((entry.query, entry.scope)) is entry:
+            del self.exact_entries[(entry.query, entry.scope)]
+        self.free_rows.append(entry.row)
+
+    def lookup_exact(self, query: str, scope: str) -> Optional[CacheEntry]:
+        entry = self.exact_entries.get((query, scope))
+        if entry is None:
+            return None
+        if self.is_expired(entry):
+            self.remove(entry)
+            return None
+        entry.last_access = time.monotonic()
+        return entry
+
+    def lookup(self, embedding: Sequence[float], scope: str) -> Optional[CacheEntry]:
+        if self.embeddings is None or not self.entries:
+            return None
+        # Embeddings are stored normalized, so the dot product is the cosine similarity
+        similarities = self.embeddings[: self.size] @ self.normalize(embedding)
+        for row in np.argsort(similarities)[::-1]:
+            if similarities[row] <= self.threshold:
+                break
+            entry = self.entries.get(int(row))
+            # Free rows keep the embedding of the entry that was removed
+            if entry is None or entry.scope != scope:
+                continue
+            if self.is_expired(entry):
+                self.remove(entry)
+                continue
+            entry.last_access = time.monotonic()
+            return entry
+        return None
+
+    def add(
+        self, query: str, embedding: Sequence[float], scope: str, data_points: dict[str, Any], completion_text: str
+    ):
+        vector = self.normalize(embedding)
+        # Replace an earlier answer to the same question, so it doesn't keep a row until it is evicted
+        if previous := self.exact_entries.get((query, scope)):
+            self.remove(previous)
+        if self.embeddings is None:
+            self.embeddings = np.zeros((self.max_size, len(vector)), dtype=np.float32)
+        if not self.free_rows:
+            if self.size < self.max_size:
+                self.free_rows.append(self.size)
+                self.size += 1
+            else:
+                # Evict the least recently used entry
+                self.remove(min(self.entries.values(), key=lambda entry: entry.last_access))
+        row = self.free_rows.pop()
+        self.embeddings[row] = vector
+        entry = CacheEntry(query, scope, data_points, completion_text, time.monotonic(), row)
+        self.entries[row] = entry
+        self.exact_entries[(query, scope)] = entry
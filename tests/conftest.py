@@ -24,6 +24,7 @@ from openai.types.create_embedding_response import Usage
 
 import app
 import core
+from approaches.approach import Approach
 from core.authentication import AuthenticationHelper
 
 from .mocks import (
@@ -49,6 +50,15 @@ async def mock_search(self, *args, **kwargs):
     return MockAsyncSearchResultsIterator(kwargs.get("search_text"), kwargs.get("vector_queries"))
 
 
+@pytest.fixture(autouse=True)
+def mock_warmup(monkeypatch):
+    async def mock_warmup(self):
+        pass
+
+    # Don't make requests to the real OpenAI endpoint when the app starts up
+    monkeypatch.setattr(Approach, "warmup", mock_warmup)
+
+
 @pytest.fixture
 def mock_get_secret(monkeypatch):
     monkeypatch.setattr(SecretClient, "get_secret", MockKeyVaultSecretClient().get_secret)
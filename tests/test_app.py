@@ -9,6 +9,7 @@ from httpx import Request, Response
 from openai import BadRequestError
 
 import app
+from approaches.approach import ThoughtStep
 
 
 def fake_response(http_code):
@@ -41,11 +42,18 @@ contextlength_response = BadRequestError(
 )
 
 
+def message_contains_text(message, text):
+    content = message["content"] if isinstance(message, dict) else message
+    if isinstance(content, list):
+        return any(text in (part.get("text") or "") for part in content)
+    return text in (content or "")
+
+
 def thought_contains_text(thought, text):
     description = thought["description"]
     if isinstance(description, str) and text in description:
         return True
-    elif isinstance(description, list) and any(text in item for item in description):
+    elif isinstance(description, list) and any(message_contains_text(item, text) for item in description):
         return True
     return False
 
@@ -679,3 +687,14 @@ async def test_format_as_ndjson():
 
     result = [line async for line in app.format_as_ndjson(gen())]
     assert result == ['{"a": "I ❤️ 🐍"}\n', '{"b": "Newlines inside \\n strings are fine"}\n']
+
+
+@pytest.mark.asyncio
+async def test_format_as_ndjson_dataclass():
+    async def gen():
+        yield {"thoughts": [ThoughtStep("Step", [{"role": "user", "content": "Hi"}], {"top": 3})]}
+
+    result = [line async for line in app.format_as_ndjson(gen())]
+    assert result == [
+        '{"thoughts": [{"title": "Step", "description": [{"role": "user", "content": "Hi"}], "props": {"top": 3}}]}\n'
+    ]
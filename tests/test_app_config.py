@@ -1,6 +1,7 @@
 import os
 from unittest import mock
 
+import httpx
 import pytest
 from azure.keyvault.secrets.aio import SecretClient
 
@@ -31,6 +32,18 @@ async def test_app_local_openai(monkeypatch, minimal_env):
         assert quart_app.config[app.CONFIG_OPENAI_CLIENT].base_url == "http://localhost:5000"
 
 
+@pytest.mark.asyncio
+async def test_app_openai_shared_http_client(monkeypatch, minimal_env):
+    quart_app = app.create_app()
+    async with quart_app.test_app():
+        openai_client = quart_app.config[app.CONFIG_OPENAI_CLIENT]
+        http_client = openai_client._client
+        assert isinstance(http_client, httpx.AsyncClient)
+        assert http_client.timeout == httpx.Timeout(600.0, connect=5.0)
+        assert quart_app.config[app.CONFIG_ASK_APPROACH].openai_client is openai_client
+        assert quart_app.config[app.CONFIG_CHAT_APPROACH].openai_client is openai_client
+
+
 @pytest.mark.asyncio
 async def test_app_config_default(monkeypatch, minimal_env):
     quart_app = app.create_app()
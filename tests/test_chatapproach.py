@@ -5,6 +5,7 @@ from azure.core.credentials import AzureKeyCredential
 from azure.search.documents.aio import SearchClient
 from openai.types.chat import ChatCompletion
 
+from approaches.approach import Approach
 from approaches.chatreadretrieveread import ChatReadRetrieveReadApproach
 
 from .mocks import (
@@ -13,6 +14,8 @@ from .mocks import (
     MockAsyncSearchResultsIterator,
 )
 
+approach_warmup = Approach.warmup
+
 
 async def mock_search(*args, **kwargs):
     return MockAsyncSearchResultsIterator(kwargs.get("search_text"), kwargs.get("vector_queries"))
@@ -360,3 +363,23 @@ async def test_search_results_filtering_by_scores(
     assert (
         len(filtered_results) == expected_result_count
     ), f"Expected {expected_result_count} results with minimum_search_score={minimum_search_score} and minimum_reranker_score={minimum_reranker_score}"
+
+
+@pytest.mark.asyncio
+async def test_warmup_ignores_errors(chat_approach, caplog):
+    class MockModels:
+        async def list(self):
+            raise Exception("Connection refused")
+
+    class MockOpenAIClient:
+        models = MockModels()
+
+        def with_options(self, **kwargs):
+            self.options = kwargs
+            return self
+
+    chat_approach.openai_client = MockOpenAIClient()
+    # The autouse fixture in conftest replaces warmup, so call the original implementation
+    await approach_warmup(chat_approach)
+    assert "Unable to warm up the OpenAI connection" in caplog.text
+    assert chat_approach.openai_client.options == {"timeout": 10.0, "max_retries": 0}
@@ -1,3 +1,4 @@
+import asyncio
 import json
 
 import pytest
@@ -7,6 +8,7 @@ from azure.search.documents.models import (
 )
 from openai.types.chat import ChatCompletion
 
+from approaches.approach import Document
 from approaches.chatreadretrievereadvision import ChatReadRetrieveReadVisionApproach
 from core.authentication import AuthenticationHelper
 
@@ -146,3 +148,80 @@ async def test_compute_text_embedding(chat_approach, openai_client, mock_openai_
     assert result.vector == [0.0023064255, -0.009327292, -0.0028842222]
     assert result.k_nearest_neighbors == 50
     assert result.fields == "embedding"
+
+
+@pytest.mark.asyncio
+async def test_run_until_final_call_runs_requests_concurrently(chat_approach, openai_client, monkeypatch):
+    # Each mock waits for the one requested after it, so the requests only complete when they run concurrently
+    image_embedding_started = asyncio.Event()
+    second_image_started = asyncio.Event()
+
+    async def mock_compute_text_embedding(q):
+        await asyncio.wait_for(image_embedding_started.wait(), timeout=1)
+        return VectorizedQuery(vector=[1.0], k_nearest_neighbors=50, fields="embedding")
+
+    async def mock_compute_image_embedding(q):
+        image_embedding_started.set()
+        return VectorizedQuery(vector=[2.0], k_nearest_neighbors=50, fields="imageEmbedding")
+
+    async def mock_fetch_image(blob_container_client, result):
+        if result.sourcepage == "first.png":
+            await asyncio.wait_for(second_image_started.wait(), timeout=1)
+        else:
+            second_image_started.set()
+        return "data:image/png;base64," + result.sourcepage
+
+    searched_vectors = []
+
+    async def mock_search(top, query_text, filter, vectors, *args):
+        searched_vectors.extend(vectors)
+        return [
+            Document(
+                id=sourcepage,
+                content="content",
+                embedding=None,
+                image_embedding=None,
+                category=None,
+                sourcepage=sourcepage,
+                sourcefile="file.pdf",
+                oids=None,
+                groups=None,
+                captions=[],
+            )
+            for sourcepage in ["first.png", "second.png"]
+        ]
+
+    async def mock_create(*args, **kwargs):
+        return ChatCompletion(
+            id="test-id",
+            object="chat.completion",
+            created=1,
+            model="gpt-4v",
+            choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "query"}}],
+        )
+
+    def mock_get_messages_from_history(system_prompt, model_id, history, user_content, max_tokens, few_shots=[]):
+        return [{"role": "user", "content": user_content}]
+
+    openai_client.chat = openai_client
+    openai_client.completions = openai_client
+    monkeypatch.setattr(openai_client, "create", mock_create)
+    monkeypatch.setattr(chat_approach, "compute_text_embedding", mock_compute_text_embedding)
+    monkeypatch.setattr(chat_approach, "compute_image_embedding", mock_compute_image_embedding)
+    monkeypatch.setattr(chat_approach, "search", mock_search)
+    monkeypatch.setattr(chat_approach, "get_messages_from_history", mock_get_messages_from_history)
+    monkeypatch.setattr("approaches.chatreadretrievereadvision.fetch_image", mock_fetch_image)
+
+    extra_info, chat_coroutine = await chat_approach.run_until_final_call(
+        [{"role": "user", "content": "What is the interest rate?"}],
+        {"vector_fields": ["embedding", "imageEmbedding"]},
+        {},
+    )
+    chat_coroutine.close()
+
+    assert [vector.fields for vector in searched_vectors] == ["embedding", "imageEmbedding"]
+    user_content = extra_info["thoughts"][-1].description[-1]["content"]
+    assert [part["image_url"] for part in user_content if part["type"] == "image_url"] == [
+        "data:image/png;base64,first.png",
+        "data:image/png;base64,second.png",
+    ]
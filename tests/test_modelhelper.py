@@ -1,6 +1,7 @@
 import pytest
 
 from core.modelhelper import (
+    get_encoding_for_model,
     get_oai_chatmodel_tiktok,
     get_token_limit,
     num_tokens_from_messages,
@@ -91,3 +92,8 @@ def test_get_oai_chatmodel_tiktok_error():
         get_oai_chatmodel_tiktok(None)
     with pytest.raises(ValueError, match="Expected Azure OpenAI ChatGPT model name"):
         get_oai_chatmodel_tiktok("gpt-3")
+
+
+def test_get_encoding_for_model_error():
+    with pytest.raises(ValueError, match="Expected Azure OpenAI ChatGPT model name"):
+        get_encoding_for_model("gpt-3")
@@ -0,0 +1,348 @@
+import json
+
+import pytest
+from openai.types import CreateEmbeddingResponse, Embedding
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from openai.types.create_embedding_response import Usage
+
+from approaches.chatreadretrieveread import ChatReadRetrieveReadApproach
+from core.semanticcache import SemanticCache
+
+from .mocks import MOCK_EMBEDDING_DIMENSIONS, MOCK_EMBEDDING_MODEL_NAME
+
+
+def test_semanticcache_hit():
+    cache = SemanticCache(threshold=0.9)
+    cache.add("question", [1.0, 0.0, 0.0], "scope", {"text": []}, "The answer")
+
+    entry = cache.lookup([0.99, 0.05, 0.0], "scope")
+    assert entry is not None
+    assert entry.completion_text == "The answer"
+
+
+def test_semanticcache_miss_below_threshold():
+    cache = SemanticCache(threshold=0.9)
+    cache.add("question", [1.0, 0.0, 0.0], "scope", {}, "The answer")
+
+    assert cache.lookup([0.5, 0.5, 0.0], "scope") is None
+
+
+def test_semanticcache_miss_other_scope():
+    cache = SemanticCache(threshold=0.9)
+    cache.add("question", [1.0, 0.0, 0.0], "scope", {}, "The answer")
+
+    assert cache.lookup([1.0, 0.0, 0.0], "other scope") is None
+
+
+def test_semanticcache_evicts_least_recently_used():
+    cache = SemanticCache(threshold=0.9, max_size=2)
+    cache.add("first question", [1.0, 0.0, 0.0], "scope", {}, "first")
+    cache.add("second question", [0.0, 1.0, 0.0], "scope", {}, "second")
+    assert cache.lookup([1.0, 0.0, 0.0], "scope") is not None
+    embeddings = cache.embeddings
+
+    cache.add("third question", [0.0, 0.0, 1.0], "scope", {}, "third")
+
+    # The new entry takes the row of the evicted one, the matrix is not reallocated
+    assert cache.embeddings is embeddings
+    assert cache.embeddings.shape == (2, 3)
+    assert cache.exact_entries[("third question", "scope")].row == 1
+    assert len(cache.entries) == 2
+    assert len(cache.exact_entries) == 2
+    assert cache.lookup([0.0, 1.0, 0.0], "scope") is None
+    assert cache.lookup([1.0, 0.0, 0.0], "scope").completion_text == "first"
+    assert cache.lookup([0.0, 0.0, 1.0], "scope").completion_text == "third"
+
+
+def test_semanticcache_exact_hit():
+    cache = SemanticCache(threshold=0.9)
+    cache.add("question", [1.0, 0.0, 0.0], "scope", {}, "The answer")
+
+    assert cache.lookup_exact("question", "scope").completion_text == "The answer"
+    assert cache.lookup_exact("question", "other scope") is None
+    assert cache.lookup_exact("other question", "scope") is None
+
+
+def test_semanticcache_expired():
+    cache = SemanticCache(threshold=0.9, ttl=60)
+    cache.add("question", [1.0, 0.0, 0.0], "scope", {}, "The answer")
+    cache.entries[0].created -= 61
+
+    assert cache.lookup_exact("question", "scope") is None
+    assert cache.lookup([1.0, 0.0, 0.0], "scope") is None
+
+
+class MockOpenAIClient:
+    """Answers every chat completion with the same answer and counts the calls."""
+
+    def __init__(self, answer="The answer", finish_reason="stop", embedding=[1.0, 0.0, 0.0]):
+        self.answer = answer
+        self.finish_reason = finish_reason
+        self.embedding = embedding
+        self.chat_calls = 0
+        self.embedding_calls = 0
+        self.chat = self
+        self.completions = self
+        self.embeddings = MockEmbeddings(self)
+
+    async def create(self, *args, **kwargs):
+        self.chat_calls += 1
+        if "tools" in kwargs:
+            # Use the user question as the search query
+            question = kwargs["messages"][-1]["content"].removeprefix("Generate search query for: ")
+            return self.chat_completion(question, "stop")
+        if kwargs.get("stream"):
+            return self.chat_completion_stream()
+        return self.chat_completion(self.answer, self.finish_reason)
+
+    def chat_completion(self, content, finish_reason):
+        return ChatCompletion(
+            id="test-id",
+            object="chat.completion",
+            created=1,
+            model="gpt-35-turbo",
+            choices=[
+                {"index": 0, "finish_reason": finish_reason, "message": {"role": "assistant", "content": content}}
+            ],
+        )
+
+    async def chat_completion_stream(self):
+        deltas = [{"role": "assistant"}] + [{"content": word} for word in self.answer.split(" ")]
+        for index, delta in enumerate(deltas):
+            if index > 1:
+                delta["content"] = " " + delta["content"]
+            yield ChatCompletionChunk(
+                id="test-id",
+                object="chat.completion.chunk",
+                created=1,
+                model="gpt-35-turbo",
+                choices=[{"index": 0, "finish_reason": None, "delta": delta}],
+            )
+        yield ChatCompletionChunk(
+            id="test-id",
+            object="chat.completion.chunk",
+            created=1,
+            model="gpt-35-turbo",
+            choices=[{"index": 0, "finish_reason": self.finish_reason, "delta": {}}],
+        )
+
+
+class MockEmbeddings:
+    def __init__(self, client):
+        self.client = client
+
+    async def create(self, *args, **kwargs):
+        self.client.embedding_calls += 1
+        if self.client.embedding is None:
+            raise ConnectionError("No embedding deployment")
+        return CreateEmbeddingResponse(
+            object="list",
+            data=[Embedding(embedding=self.client.embedding, index=0, object="embedding")],
+            model=MOCK_EMBEDDING_MODEL_NAME,
+            usage=Usage(prompt_tokens=8, total_tokens=8),
+        )
+
+
+def test_semanticcache_expired_entry_removed():
+    cache = SemanticCache(threshold=0.9, ttl=60)
+    cache.add("question", [1.0, 0.0, 0.0], "scope", {}, "The answer")
+    cache.entries[0].created -= 61
+
+    assert cache.lookup([1.0, 0.0, 0.0], "scope") is None
+    assert cache.entries == {}
+    assert cache.exact_entries == {}
+
+
+def test_semanticcache_readd_after_expiry():
+    cache = SemanticCache(threshold=0.9, ttl=60)
+    cache.add("question", [1.0, 0.0, 0.0], "scope", {}, "The old answer")
+    cache.entries[0].created -= 61
+
+    cache.add("question", [1.0, 0.0, 0.0], "scope", {}, "The new answer")
+
+    assert len(cache.entries) == 1
+    assert cache.lookup([1.0, 0.0, 0.0], "scope").completion_text == "The new answer"
+    assert cache.lookup_exact("question", "scope").completion_text == "The new answer"
+
+
+@pytest.fixture
+def openai_client():
+    return MockOpenAIClient()
+
+
+@pytest.fixture
+def cached_chat_approach(monkeypatch, openai_client):
+    chat_approach = ChatReadRetrieveReadApproach(
+        search_client=None,
+        auth_helper=None,
+        openai_client=openai_client,
+        chatgpt_model="gpt-35-turbo",
+        chatgpt_deployment="chat",
+        embedding_deployment="embeddings",
+        embedding_model=MOCK_EMBEDDING_MODEL_NAME,
+        embedding_dimensions=MOCK_EMBEDDING_DIMENSIONS,
+        sourcepage_field="",
+        content_field="",
+        query_language="en-us",
+        query_speller="lexicon",
+        semantic_cache=SemanticCache(),
+    )
+
+    def mock_get_messages_from_history(system_prompt, model_id, history, user_content, max_tokens, few_shots=[]):
+        return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_content}]
+
+    async def mock_search(*args, **kwargs):
+        return []
+
+    monkeypatch.setattr(chat_approach, "build_filter", lambda overrides, auth_claims: None)
+    monkeypatch.setattr(chat_approach, "get_messages_from_history", mock_get_messages_from_history)
+    monkeypatch.setattr(chat_approach, "search", mock_search)
+    return chat_approach
+
+
+@pytest.mark.asyncio
+async def test_chat_approach_semanticcache_hit(cached_chat_approach, openai_client):
+    scope = '{"filter": null, "overrides": {}}'
+    cached_chat_approach.semantic_cache.add("Cached question", [1.0, 0.0, 0.0], scope, {"text": []}, "Cached")
+
+    result = await cached_chat_approach.run([{"role": "user", "content": "What is the capital of France?"}])
+
+    assert result["choices"][0]["message"]["content"] == "Cached"
+    assert result["choices"][0]["context"]["data_points"] == {"text": []}
+    assert openai_client.chat_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_chat_approach_semanticcache_hit_streaming(cached_chat_approach, openai_client):
+    scope = '{"filter": null, "overrides": {}}'
+    cached_chat_approach.semantic_cache.add("Cached question", [1.0, 0.0, 0.0], scope, {"text": []}, "Cached")
+
+    result = await cached_chat_approach.run(
+        [{"role": "user", "content": "What is the capital of France?"}], stream=True
+    )
+    events = [event async for event in result]
+
+    assert events[0]["choices"][0]["context"]["data_points"] == {"text": []}
+    assert events[1]["choices"][0]["delta"]["content"] == "Cached"
+    assert openai_client.chat_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_chat_approach_semanticcache_exact_hit(cached_chat_approach, openai_client):
+    scope = '{"filter": null, "overrides": {}}'
+    cached_chat_approach.semantic_cache.add("Cached question", [0.0, 1.0, 0.0], scope, {}, "Cached")
+
+    result = await cached_chat_approach.run([{"role": "user", "content": "Cached question"}])
+
+    assert result["choices"][0]["message"]["content"] == "Cached"
+    assert openai_client.embedding_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_chat_approach_semanticcache_miss_then_hit(cached_chat_approach, openai_client):
+    result = await cached_chat_approach.run([{"role": "user", "content": "What is the deductible?"}])
+    assert result["choices"][0]["message"]["content"] == "The answer"
+    assert openai_client.chat_calls == 2
+    assert len(cached_chat_approach.semantic_cache.entries) == 1
+
+    result = await cached_chat_approach.run([{"role": "user", "content": "How much is the deductible?"}])
+
+    assert result["choices"][0]["message"]["content"] == "The answer"
+    assert result["choices"][0]["context"]["data_points"] == {"text": []}
+    assert openai_client.chat_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_chat_approach_semanticcache_miss_then_hit_streaming(cached_chat_approach, openai_client):
+    openai_client.answer = "The streamed answer"
+    result = await cached_chat_approach.run([{"role": "user", "content": "What is the deductible?"}], stream=True)
+    events = [event async for event in result]
+    assert "".join(event["choices"][0]["delta"].get("content") or "" for event in events) == "The streamed answer"
+    assert openai_client.chat_calls == 2
+
+    result = await cached_chat_approach.run([{"role": "user", "content": "How much is the deductible?"}], stream=True)
+    events = [event async for event in result]
+
+    assert events[1]["choices"][0]["delta"]["content"] == "The streamed answer"
+    assert openai_client.chat_calls == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("finish_reason, answer", [("length", "The truncated"), ("stop", "")])
+@pytest.mark.parametrize("stream", [False, True])
+async def test_chat_approach_semanticcache_skips_incomplete_answers(
+    cached_chat_approach, openai_client, finish_reason, answer, stream
+):
+    openai_client.answer = answer
+    openai_client.finish_reason = finish_reason
+
+    result = await cached_chat_approach.run([{"role": "user", "content": "What is the deductible?"}], stream=stream)
+    if stream:
+        [event async for event in result]
+
+    assert cached_chat_approach.semantic_cache.entries == {}
+
+
+@pytest.mark.asyncio
+async def test_chat_approach_semanticcache_skips_follow_up_questions(cached_chat_approach, openai_client):
+    scope = '{"filter": null, "overrides": {}}'
+    cached_chat_approach.semantic_cache.add("Cached question", [1.0, 0.0, 0.0], scope, {}, "Cached")
+
+    result = await cached_chat_approach.run(
+        [
+            {"role": "user", "content": "What is the deductible?"},
+            {"role": "assistant", "content": "It depends on the plan."},
+            {"role": "user", "content": "Cached question"},
+        ]
+    )
+
+    assert result["choices"][0]["message"]["content"] == "The answer"
+    assert len(cached_chat_approach.semantic_cache.entries) == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_approach_semanticcache_hit_hides_other_users_question(cached_chat_approach):
+    await cached_chat_approach.run(
+        [{"role": "user", "content": "What is my deductible after my divorce?"}],
+        context={"auth_claims": {"oid": "user-a"}},
+    )
+
+    result = await cached_chat_approach.run(
+        [{"role": "user", "content": "What is the deductible?"}], context={"auth_claims": {"oid": "user-b"}}
+    )
+
+    context = result["choices"][0]["context"]
+    assert result["choices"][0]["message"]["content"] == "The answer"
+    assert "divorce" not in json.dumps(context, default=vars)
+    assert context["thoughts"][0].title == "Served from semantic cache"
+    assert context["thoughts"][0].description == "What is the deductible?"
+
+
+@pytest.mark.asyncio
+async def test_chat_approach_semanticcache_reuses_embedding(cached_chat_approach, openai_client, monkeypatch):
+    searched_vectors = []
+
+    async def mock_search(top, query_text, filter, vectors, *args):
+        searched_vectors.extend(vectors)
+        return []
+
+    monkeypatch.setattr(cached_chat_approach, "search", mock_search)
+
+    await cached_chat_approach.run([{"role": "user", "content": "What is the deductible?"}])
+
+    # The generated search query is the question itself, so its embedding is only computed once
+    assert openai_client.embedding_calls == 1
+    assert searched_vectors[0].vector == [1.0, 0.0, 0.0]
+    assert searched_vectors[0].fields == "embedding"
+
+
+@pytest.mark.asyncio
+async def test_chat_approach_semanticcache_embedding_error(cached_chat_approach, openai_client):
+    openai_client.embedding = None
+
+    result = await cached_chat_approach.run(
+        [{"role": "user", "content": "What is the deductible?"}], context={"overrides": {"retrieval_mode": "text"}}
+    )
+
+    assert result["choices"][0]["message"]["content"] == "The answer"
+    assert cached_chat_approach.semantic_cache.entries == {}